@@ -51,7 +51,8 @@ def main():
 
     # Execute and show results
     if args.command == "forward":
-        ret = alteruphono.forward(args.sequence, args.rule)
+        post_seq = alteruphono.forward(args.sequence, args.rule)
+        ret = " ".join([str(seg) for seg in post_seq])
     elif args.command == "backward":
         ret = [str(seq) for seq in alteruphono.backward(args.sequence, args.rule)]
 
@@ -1,13 +1,18 @@
+import functools
 import itertools
 from typing import List, Union, Tuple
 
-from maniphono import SegSequence, Sound, SoundSegment, Segment, BoundarySegment
+from maniphono import (
+    SegSequence,
+    Segment,
+    BoundarySegment,
+    parse_sequence,
+)
 
-from .common import check_match
+from .common import match_window
 from .model import (
     Token,
     BackRefToken,
-    EmptyToken,
     BoundaryToken,
     SegmentToken,
     ChoiceToken,
@@ -15,6 +20,37 @@ from .model import (
 )
 from .parser import Rule
 
+# Map of the operators that can prefix a feature value in a modifier to the
+# operator reverting them; values without an operator are additions, which are
+# reverted by a removal
+MODIFIER_INVERSION = {"+": "-", "-": "+"}
+
+# Boundary segments carry no information, so a single one is shared by all
+# reconstructed sequences
+BOUNDARY_SEGMENT = BoundarySegment()
+
+
+# TODO: move this operation to maniphono
+@functools.lru_cache(maxsize=1024)
+def _invert_modifier(modifier: str) -> str:
+    """
+    Internal function for inverting the modifier of a back-reference.
+
+    As rules are applied many times, results are cached by modifier string.
+
+    @param modifier: The modifier to be inverted, such as `"+voiced,-stop"`.
+    @return: The inverted modifier, such as `"-voiced,+stop"`.
+    """
+
+    inverted = []
+    for mod in modifier.split(","):
+        if mod[0] in MODIFIER_INVERSION:
+            inverted.append(MODIFIER_INVERSION[mod[0]] + mod[1:])
+        else:
+            inverted.append("-" + mod)
+
+    return ",".join(inverted)
+
 
 def _backward_translate(
     sequence: List[Segment], rule: Rule, match_info: List[Union[Segment, bool, int]]
@@ -25,9 +61,10 @@ def _backward_translate(
     set_index = []
     for idx, t in enumerate(rule.ante):
         if isinstance(t, BoundaryToken):
-            recons.append(BoundarySegment())
+            recons.append(BOUNDARY_SEGMENT)
         elif isinstance(t, SegmentToken):
-            recons.append(t.segment)
+            # Segments from the rule are shared, so a copy is returned to the user
+            recons.append(t.copy_segment())
         elif isinstance(t, ChoiceToken):
             # TODO: can we get the right one? If not, make a partial sound?
             recons.append(t)
@@ -35,36 +72,29 @@ def _backward_translate(
             recons.append(t)
             set_index.append(idx)
 
-    # Remove empty tokens that might be in the POST rule (and that are obviously
+    # Sets will be consumed in order, so we use an iterator over their indexes
+    set_index = iter(set_index)
+
+    # Skip empty tokens that might be in the POST rule (and that are obviously
     # missing from the matched subtring) and iterate over pairs of POST tokens and
     # matched sequence tokens, filling "recons"tructed seq
-    no_empty = [token for token in rule.post if not isinstance(token, EmptyToken)]
-    for post_token, seq_token, match in zip(no_empty, sequence, match_info):
+    for post_token, seq_token, match in zip(rule.nonempty_post, sequence, match_info):
         if isinstance(post_token, BackRefToken):
-            # build modifier to be "inverted"
-            # TODO: move this operation to maniphono
-            recons[post_token.index] = seq_token
             if post_token.modifier:
-                modifiers = []
-                for mod in post_token.modifier.split(","):
-                    if mod[0] == "-":
-                        modifiers.append("+" + mod[1:])
-                    elif mod[0] == "+":
-                        modifiers.append("-" + mod[1:])
-                    else:
-                        modifiers.append("-" + mod)
-
-                # TODO: fix this horrible hack that uses graphemes to circumvent
-                #  difficulties with copies
-                gr = str(seq_token)
-                snd = Sound(gr)
-                snd += ",".join(modifiers)
-                recons[post_token.index] = SoundSegment([snd])
+                # Adding the inverted modifier returns a new segment, leaving the
+                # one in the matched sequence untouched
+                recons[post_token.index] = seq_token + _invert_modifier(
+                    post_token.modifier
+                )
+            else:
+                recons[post_token.index] = seq_token
 
         elif isinstance(post_token, SetToken):
             # grab the index of the next set
-            idx = set_index.pop(0)
+            idx = next(set_index)
             recons[idx] = recons[idx].choices[match]
+            if isinstance(recons[idx], SegmentToken):
+                recons[idx] = recons[idx].copy_segment()
 
         # TODO: map tokens (from alteruphono) to segments (maniphono)
 
@@ -89,38 +119,58 @@ def _carry_backref_modifier(ante_token: Token, post_token: BackRefToken) -> Toke
             if len(ante_token.segment.sounds) != 1:
                 raise ValueError("only monosonic")
 
-            # make a copy
-            # TODO: can address directly .segment instead of .segment.sound[0]?
-            snd = ante_token.segment.sounds[0] + post_token.modifier
-            return SegmentToken(snd)
-            #x = ante_token.segment.sounds[0]
-            #return x + post_token.modifier
+            # Adding the modifier returns a new token, leaving the rule unaltered
+            return ante_token + post_token.modifier
 
-        # TODO: can we join choice and set into a single signature?
-        elif isinstance(ante_token, SetToken):
-            for choice in ante_token.choices:
-                choice.add_modifier(post_token.modifier)
-
-        elif isinstance(ante_token, ChoiceToken):
-            for choice in ante_token.choices:
-                choice.add_modifier(post_token.modifier)
+        # Sets and choices are rebuilt with modified copies of their choices, as the
+        # tokens of the rule (which are shared by rules parsed from the same string)
+        # must not be modified
+        elif isinstance(ante_token, (SetToken, ChoiceToken)):
+            return type(ante_token)(
+                [choice + post_token.modifier for choice in ante_token.choices]
+            )
 
     # return non-modified
     return ante_token
 
 
-# TODO: make sure it works with repeated backreferences, such as "V s > @1 z @1",
-# which we *cannot* have mapped only as "V z V"
-def backward(post_seq: SegSequence, rule: Rule) -> List[SegSequence]:
-    # Compute the `post_ast`, applying modifiers and skipping nulls
-    post_ast = [token for token in rule.post if not isinstance(token, EmptyToken)]
+@functools.lru_cache(maxsize=1024)
+def _backward_pattern(rule: Rule) -> Tuple[Token, ...]:
+    """
+    Internal function for building the pattern matched by a rule in backward mode.
+
+    The pattern is the `post` of the rule, with modifiers applied and nulls skipped.
+    As tokens are never modified, patterns are cached by rule and built only once.
+
+    @param rule: The rule whose pattern is to be built.
+    @return: The tokens to be matched in the sequence.
+    """
 
-    post_ast = [
+    return tuple(
         token
         if not isinstance(token, BackRefToken)
         else _carry_backref_modifier(rule.ante[token.index], token)
-        for token in post_ast
-    ]
+        for token in rule.nonempty_post
+    )
+
+
+# TODO: make sure it works with repeated backreferences, such as "V s > @1 z @1",
+# which we *cannot* have mapped only as "V z V"
+def backward(
+    post_seq: Union[str, SegSequence], rule: Union[str, Rule]
+) -> List[SegSequence]:
+    # Parse the sequence and the rule if they were given as strings
+    if isinstance(post_seq, str):
+        post_seq = parse_sequence(post_seq, boundaries=True)
+    if isinstance(rule, str):
+        rule = Rule(rule)
+
+    # Get the `post_ast`, with modifiers applied and nulls skipped
+    post_ast = _backward_pattern(rule)
+
+    # Cache the lengths of `post_seq` and `post_ast` for speed
+    len_seq = len(post_seq)
+    len_ast = len(post_ast)
 
     # Iterate over the sequence, checking if subsequences match the specified `post`.
     # We operate inside a `while True` loop because we don't allow overlapping
@@ -130,45 +180,62 @@ def backward(post_seq: SegSequence, rule: Rule) -> List[SegSequence]:
     # other languages it is better to keep it as dumb loop.
     idx = 0
     ante_seqs = []
+    unmatched = False
     while True:
-        # TODO: implement a better subsetting of sequence, as a normal python Sequence
-        sub_seq: List[Segment] = [
-            post_seq[i] for i in range(idx, min(len(post_seq), idx + len(post_ast)))
-        ]
-
-        match, match_list = check_match(sub_seq, post_ast)
+        # Slicing the sequence returns the window as a new list in a single
+        # operation (shorter at the end of the sequence), instead of indexing each
+        # position at the Python level
+        sub_seq: List[Segment] = post_seq[idx : idx + len_ast]
 
-        if len(match_list) == 0:
+        # Stop when there is nothing left to match
+        if not sub_seq:
             break
 
-        if match:
+        # Windows are matched stopping at the first position that does not match
+        match_list = match_window(sub_seq, post_ast)
+
+        if match_list is not None:
             ante_seqs.append(_backward_translate(sub_seq, rule, match_list))
-            idx += len(post_ast)
+            idx += len_ast
+            unmatched = False
         else:
+            # Unmatched positions have a single candidate, so a run of them is
+            # collected in a single entry, which is then a single factor in the
+            # product of candidates instead of one factor per position
             # TODO: remove these nested lists if possible
-            ante_seqs.append([[post_seq[idx]]])
+            if unmatched:
+                ante_seqs[-1][0].append(post_seq[idx])
+            else:
+                ante_seqs.append([[post_seq[idx]]])
             idx += 1
+            unmatched = True
 
-        if idx == len(post_seq):
+        if idx == len_seq:
             break
 
-    ante_seqs = [
-        SegSequence(list(itertools.chain.from_iterable(candidate)), boundaries=True)
-        for candidate in itertools.product(*ante_seqs)
-    ]
-
-    # Due to difficulties in dealing with rules composed only of boundaries (especially
-    # when they involve deletions, like `C > :null: / _ #`, we need to make sure no
-    # proto-form with internal boundaries are generated here. This code might not seem
-    # so elegant, but makes it easier to understand what we are doing, and allows us
-    # to follow the established practices of using a single symbol ("#") for both
-    # leading and trailing boundaries (compare with regular expressions with "^" and "$")
-    filtered = []
-    for seq in ante_seqs:
-        # Check for internal boundaries
-        if not any([isinstance(token, BoundaryToken) for token in seq[1:-1]]):
-            filtered.append(seq)
-
-    # TODO: must take set, as the rule might lead to the same pattern multiple times
-    filtered = sorted(filtered, key=str)
-    return filtered
+    # Candidates are generated lazily from the product of the alternatives at each
+    # position, so that each one is built, filtered, and deduplicated in a single
+    # pass without materializing intermediate lists of all of them
+    unique = {}
+    for candidate in itertools.product(*ante_seqs):
+        seq = SegSequence(
+            list(itertools.chain.from_iterable(candidate)), boundaries=True
+        )
+
+        # Due to difficulties in dealing with rules composed only of boundaries
+        # (especially when they involve deletions, like `C > :null: / _ #`, we need to
+        # make sure no proto-form with internal boundaries are generated here. This
+        # code might not seem so elegant, but makes it easier to understand what we
+        # are doing, and allows us to follow the established practices of using a
+        # single symbol ("#") for both leading and trailing boundaries (compare with
+        # regular expressions with "^" and "$")
+        if any(isinstance(token, BoundaryToken) for token in seq[1:-1]):
+            continue
+
+        # The rule might lead to the same pattern multiple times, so we drop
+        # duplicate candidates by their string representation, which is also used for
+        # sorting. As building the graphemic representation of a sequence is
+        # expensive, it is computed only once for each candidate.
+        unique.setdefault(str(seq), seq)
+
+    return [unique[key] for key in sorted(unique)]
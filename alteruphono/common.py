@@ -2,13 +2,149 @@
 Module with functions and values shared across different parts of the library.
 """
 
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
-from maniphono import Segment, SoundSegment, Sound
+from maniphono import BoundarySegment, Segment, SoundSegment, Sound
 
 from .model import Token, ChoiceToken, SetToken, SegmentToken, BoundaryToken
 
 
+def _match_segment(token: Segment, ref: SegmentToken) -> bool:
+    """
+    Internal function for matching a segment against a segment token.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The segment token from the pattern.
+    @return: Whether the segment matches the token.
+    """
+
+    # TODO: currently working only with monosonic segments
+    # If the reference segment is not partial, we can just compare the hash
+    # of `token` to the one cached for `ref.segment` (which is what the `==`
+    # overloaded operator does); if it is partial, we check if the feature
+    # values of the sound in `token` include all those cached for the
+    # reference (the equivalent of the `>=` overloaded operator), which also
+    # involves making sure `token` itself is a segment
+    if not ref.partial:
+        return hash(token) == hash(ref)
+
+    if not isinstance(token, SoundSegment):
+        return False
+
+    return ref.fvalues.issubset(token.sounds[0].fvalues)
+
+
+def _match_choice(token: Segment, ref: ChoiceToken) -> Union[Segment, bool]:
+    """
+    Internal function for matching a segment against a choice token.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The choice token from the pattern.
+    @return: The segment itself if any of the choices matches it, `False` otherwise.
+    """
+
+    # Matches all segments, such as boundaries and sounds
+    for choice in ref.choices:
+        if _match_token(token, choice) is not False:
+            return token
+
+    return False
+
+
+def _match_set(token: Segment, ref: SetToken) -> Union[int, bool]:
+    """
+    Internal function for matching a segment against a set token.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The set token from the pattern.
+    @return: The index of the alternative of the set that matches the segment, or
+        `False` if none matches.
+    """
+
+    # Check if it is a set correspondence, which effectively works as a
+    # choice here (but we need to keep track of) which set alternative
+    # was matched; the first match is returned, without checking the remaining
+    # alternatives or searching for it afterwards
+    for idx, alt in enumerate(ref.choices):
+        if _match_token(token, alt) is not False:
+            return idx
+
+    return False
+
+
+def _match_sound(token: Segment, ref: Sound) -> bool:
+    """
+    Internal function for matching a segment against a bare sound.
+
+    Bare sounds might be passed by users in patterns; they are compared directly,
+    as wrapping them in segment tokens would mean recomputing the cached values
+    at every position.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The sound from the pattern.
+    @return: Whether the segment matches the sound.
+    """
+
+    # TODO: check why it is capturing as maniphono.sound.Sound and not SoundSegment
+    # As for segment tokens, non-partial sounds are compared for equality, and
+    # partial ones by checking if their feature values are included in those of
+    # the sound of `token` (the equivalent of the `>=` overloaded operator)
+    if not ref.partial:
+        return token == ref
+
+    if not isinstance(token, SoundSegment):
+        return False
+
+    return frozenset(token.sounds[0].fvalues).issuperset(ref.fvalues)
+
+
+def _match_boundary(token: Segment, ref: BoundaryToken) -> bool:
+    """
+    Internal function for matching a segment against a boundary token.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The boundary token from the pattern.
+    @return: Whether the segment is a boundary.
+    """
+
+    # Checking the type is much faster than building the graphemic
+    # representation of `token` and comparing it to "#"
+    return isinstance(token, BoundarySegment)
+
+
+# Map of the token types that can be matched to the functions matching them, so
+# that a single dictionary lookup replaces a chain of `isinstance()` checks for
+# every position
+MATCHERS = {
+    ChoiceToken: _match_choice,
+    SetToken: _match_set,
+    SegmentToken: _match_segment,
+    BoundaryToken: _match_boundary,
+    Sound: _match_sound,
+}
+
+
+def _match_token(token: Segment, ref: Token) -> Union[Segment, bool, int, None]:
+    """
+    Internal function for matching a segment against a single reference.
+
+    @param token: The segment from the sequence to be matched.
+    @param ref: The reference from the pattern, usually a token.
+    @return: The result of the match, as collected by `check_match()`, or `None` if
+        the reference is of a type that is not matched (such as focus tokens).
+    """
+
+    matcher = MATCHERS.get(type(ref))
+    if matcher is not None:
+        return matcher(token, ref)
+
+    # Subclasses of sounds are not in the map of matchers
+    if isinstance(ref, Sound):
+        return _match_sound(token, ref)
+
+    return None
+
+
 # Note that we need to return a list because in the check_match we are retuning
 # not only a boolean of whether there is a match, but also the index of the
 # backr eference in case there is one (added +1)
@@ -38,52 +174,40 @@ def check_match(
     # case of a match.
     ret_list = []
     for token, ref in zip(sequence, pattern):
-        if isinstance(ref, ChoiceToken):
-            match_segment = False
-            for choice in ref.choices:
-                # Matches all segments, such as boundaries and sounds
-                match, segment = check_match([token], [choice])
-                if match:
-                    match_segment = token
-                    break
-            ret_list.append(match_segment)
-        elif isinstance(ref, SetToken):
-            # Check if it is a set correspondence, which effectively works as a
-            # choice here (but we need to keep track of) which set alternative
-            # was matched
-
-            alt_matches = [check_match([token], [alt])[0] for alt in ref.choices]
-
-            if not any(alt_matches):
-                ret_list.append(False)
-            else:
-                ret_list.append(alt_matches.index(True))
-        elif isinstance(ref, SegmentToken):
-            # TODO: currently working only with monosonic segments
-            # If the reference segment is not partial, we can just compare `token` to
-            # `ref.segment`; if it is partial, we can compare the sounds in each
-            # with the `>=` overloaded operator, which also involves making sure
-            # `token` itself is a segment
-            if not ref.segment.sounds[0].partial:
-                ret_list.append(token == ref.segment)
-            else:
-                if not isinstance(token, SoundSegment):
-                    ret_list.append(False)
-                else:
-                    ret_list.append(token.sounds[0] >= ref.segment.sounds[0])
-        elif isinstance(ref, Sound):
-            # TODO: check how similar to the above (ref.type==segment)
-            # TODO: check why it is capturing as maniphono.sound.Sound and not SoundSegment
-            if not ref.partial:
-                ret_list.append(token == ref)
-            else:
-                if not isinstance(token, SoundSegment):
-                    ret_list.append(False)
-                else:
-                    ret_list.append(token.sounds[0] >= ref)
-        elif isinstance(ref, BoundaryToken):
-            ret_list.append(str(token) == "#")
+        match = _match_token(token, ref)
+        if match is not None:
+            ret_list.append(match)
 
     # make sure we treat zeros (that might be indexes) differently fromFalse
     # TODO: return only ret_list and have the user check?
-    return all([v is not False for v in ret_list]), ret_list
+    return all(v is not False for v in ret_list), ret_list
+
+
+def match_window(
+    sequence: List[Segment], pattern: List[Token]
+) -> Optional[List[Union[Segment, bool, int]]]:
+    """
+    Internal function for matching a window of a sequence against a pattern.
+
+    Unlike `check_match()`, which reports the result of every position, this
+    function stops at the first position that does not match, as forward and
+    backward operations only need the match information of full matches.
+
+    @param sequence: The window of segments to be matched.
+    @param pattern: The pattern of tokens to be matched.
+    @return: The match information, as returned by `check_match()`, if the
+        sequence matches the pattern, `None` otherwise.
+    """
+
+    if len(sequence) != len(pattern):
+        return None
+
+    ret_list = []
+    for token, ref in zip(sequence, pattern):
+        match = _match_token(token, ref)
+        if match is False:
+            return None
+        if match is not None:
+            ret_list.append(match)
+
+    return ret_list
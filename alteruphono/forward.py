@@ -4,93 +4,116 @@ Module with functions for forward reconstruction.
 
 from typing import List, Union
 
-from maniphono import Segment, SegSequence
+from maniphono import Segment, SegSequence, SoundSegment, parse_sequence
 
-from .common import check_match
+from .common import match_window
 from .parser import Rule
 from .model import SegmentToken, SetToken, BackRefToken
 
 
 # TODO: return always a list of segments, even of a single element (easier signature)
 def _forward_translate(
-    sequence: List[Segment], rule: Rule, match_info: List[Union[Segment, bool, int]]
-) -> List[Union[Segment, List[Segment]]]:
+    sequence: List[Segment],
+    rule: Rule,
+    match_info: List[Union[Segment, bool, int]],
+    post_seq: List[Segment],
+):
     """
     @param sequence:
     @param rule:
     @param match_info:
-    @return:
+    @param post_seq: The list of segments being built by `forward()`, to which the
+        translated segments are appended in place, so that no intermediate list
+        needs to be allocated and copied for each match.
     """
-    post_seq = []
 
-    # Build a list of indexes from `match_info`, which will be used in sequence in
-    # case of sets. This list is the return value from `check_match()`, which will
-    # hold `True` value in all cases except for backreference matches, when it will
-    # hold the index of the backreference shifted by one.
+    # Build an iterator of indexes from `match_info`, which will be consumed in
+    # sequence in case of sets. `match_info` is the return value from `check_match()`,
+    # which will hold `True` value in all cases except for backreference matches,
+    # when it will hold the index of the backreference shifted by one. Using an
+    # iterator instead of popping from the head of a list avoids shifting all the
+    # remaining items at every set.
     # NOTE: yes, we do need to check with type() because, as the values might be
     # our custom types, the `isinstace(idx, int)` will fail as we implement __add__
-    indexes = [idx for idx in match_info if type(idx) == int]
+    indexes = (idx for idx in match_info if type(idx) == int)
 
     # Iterate over all entries
     for entry in rule.post:
         # Note that this will, as intended, skip over `null`s
+        # Segments from the rule are copied, as they are shared by all rules parsed
+        # from the same string and the output can be modified by the user
         if isinstance(entry, SegmentToken):
-            post_seq.append(entry.segment)
+            post_seq.append(entry.copy_segment())
         elif isinstance(entry, SetToken):
             # The -1 in the `match` index is there to offset the +1 applied by
             # `check_match()`, so that we can differentiate False from zero.
-            idx = indexes.pop(0)
-            post_seq.append(entry.choices[idx].segment)
+            idx = next(indexes)
+            post_seq.append(entry.choices[idx].copy_segment())
         elif isinstance(entry, BackRefToken):
             # TODO: deal with "correspondence"
-            # Copy the backreference, adding the modifier (even if empty, the
-            # phonomodel would only skip over it)
+            # Copy the backreference, adding the modifier if there is one. Note that
+            # we build a new segment instead of modifying the matched one in place,
+            # so that the ante sequence is never changed and unmodified segments
+            # can be shared between the ante and the post sequences.
             token = sequence[entry.index]
-            token.add_fvalues(entry.modifier)
+            if entry.modifier and isinstance(token, SoundSegment):
+                token = token + entry.modifier
             post_seq.append(token)
 
-    return post_seq
-
 
 # TODO: should cast the result to a SegSequence?
-def forward(ante_seq: SegSequence, rule: Rule) -> List[Segment]:
+def forward(
+    ante_seq: Union[str, SegSequence], rule: Union[str, Rule]
+) -> List[Segment]:
     """
     Apply forward transformation to a sequence given a rule.
 
-    @param ante_seq:
-    @param rule:
+    @param ante_seq: The sequence to be transformed, either as a `SegSequence` or as
+        a string to be parsed (with boundaries).
+    @param rule: The rule to apply, either as a `Rule` or as a string to be parsed.
     @return:
     """
 
-    # Cache the lengths of `ante_seq` and `rule.ante` for speed
-    len_seq = len(ante_seq)
-    len_rule = len(rule.ante)
+    # Parse the sequence and the rule if they were given as strings
+    if isinstance(ante_seq, str):
+        ante_seq = parse_sequence(ante_seq, boundaries=True)
+    if isinstance(rule, str):
+        rule = Rule(rule)
+
+    # Cache `rule.ante`, its length, and the last position where it can match for
+    # speed, so that they are not looked up or computed again at every position
+    rule_ante = rule.ante
+    len_rule = len(rule_ante)
+    last_idx = len(ante_seq) - len_rule
 
     # Iterate over the sequence, checking if subsequences match the specified `ante`.
-    # We operate inside a `while True` loop because we don't allow overlapping
+    # We operate inside a `while` loop because we don't allow overlapping
     # matches, and, as such, the `idx` might be updated either with +1 (looking for
     # the next position) or with the match length. While the whole logic could be
     # performed with a more Python list comprehension, for easier conversion to
-    # other languages it is better to keep it as dumb loop.
+    # other languages it is better to keep it as dumb loop. Note that we only
+    # loop while there are enough segments left for a match: once fewer segments
+    # than the length of `ante` remain, no match is possible and the tail can be
+    # copied without checking each position.
     idx = 0
     post_seq = []
-    while True:
-        # TODO: implement a better subsetting of sequence, as a normal python Sequence
-        sub_seq: List[Segment] = [
-            ante_seq[i] for i in range(idx, min(len_seq, idx + len_rule))
-        ]
+    while idx <= last_idx:
+        # Slicing the sequence returns the window as a new list in a single
+        # operation, instead of indexing each position at the Python level
+        sub_seq: List[Segment] = ante_seq[idx : idx + len_rule]
 
-        match, match_info = check_match(sub_seq, rule.ante)
+        # Windows are matched stopping at the first position that does not match
+        match_info = match_window(sub_seq, rule_ante)
 
-        if match:
-            post_seq += _forward_translate(sub_seq, rule, match_info)
+        if match_info is not None:
+            _forward_translate(sub_seq, rule, match_info, post_seq)
             idx += len_rule
         else:
             post_seq.append(ante_seq[idx])
             idx += 1
 
-        if idx == len_seq:
-            break
+    # Copy the tail that is too short to match
+    post_seq += ante_seq[idx:]
 
     # TODO: post_seq should be a segsequence, and we should take care of setting
     # .boudaries if necessary
@@ -2,13 +2,41 @@
 Module holding the classes for the manipulation of sound changes.
 """
 
+import functools
 from typing import Union
 
-from maniphono import parse_segment, Sound, SoundSegment
+from maniphono import parse_segment, Segment, Sound, SoundSegment
 
 # TODO: all tokens should have a method to return a corresponding segment
 
+
+# Rules use a small number of distinct graphemes and sound classes, so we cache the
+# segments parsed from them. Note that cached segments are shared by all tokens
+# built from the same grapheme, and as such must never be modified in place nor
+# handed out to users: operations returning the segment of a token must return
+# the copy built by `SegmentToken.copy_segment()`.
+@functools.lru_cache(maxsize=4096)
+def _parse_grapheme(grapheme: str) -> Segment:
+    return parse_segment(grapheme)
+
+
+def _copy_sound(sound: Sound) -> Sound:
+    # Internal function for copying a sound without parsing its feature values
+    # again. A shallow copy suffices, as maniphono replaces the tuple of feature
+    # values instead of modifying it; `copy.copy()` cannot be used, as the
+    # `__getattr__` of sounds recurses on objects without attributes
+    snd = Sound.__new__(Sound)
+    snd.__dict__.update(sound.__dict__)
+
+    return snd
+
+
 class Token:
+    # Tokens are created for every atom of every rule, so their attributes are
+    # declared in slots, saving memory and speeding up attribute access during
+    # matching; subclasses must declare the attributes they add
+    __slots__ = ("index",)
+
     def __init__(self):
         # TODO: applies only to back-ref or should we reuse if possible for set/choice?
         self.index = None
@@ -27,6 +55,8 @@ class Token:
 
 
 class BoundaryToken(Token):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
@@ -42,6 +72,8 @@ class BoundaryToken(Token):
 
 
 class FocusToken(Token):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
@@ -57,6 +89,8 @@ class FocusToken(Token):
 
 
 class EmptyToken(Token):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
@@ -72,6 +106,8 @@ class EmptyToken(Token):
 
 
 class BackRefToken(Token):
+    __slots__ = ("modifier",)
+
     def __init__(self, index: int, modifier=None):
         super().__init__()
 
@@ -104,9 +140,14 @@ class BackRefToken(Token):
 
 
 class ChoiceToken(Token):
+    __slots__ = ("choices",)
+
     def __init__(self, choices):
         super().__init__()
-        self.choices = choices
+
+        # Choices are never changed after parsing, so they are stored in a tuple,
+        # which is more compact and can be hashed directly
+        self.choices = tuple(choices)
 
     def __str__(self) -> str:
         return "|".join([str(choice) for choice in self.choices])
@@ -115,7 +156,7 @@ class ChoiceToken(Token):
         return f"choice_tok:{str(self)}"
 
     def __hash__(self):
-        return hash(tuple(self.choices))
+        return hash(self.choices)
 
     def __eq__(self, other) -> bool:
         return hash(self) == hash(other)
@@ -125,9 +166,13 @@ class ChoiceToken(Token):
 
 
 class SetToken(Token):
+    __slots__ = ("choices",)
+
     def __init__(self, choices):
         super().__init__()
-        self.choices = choices
+
+        # As for choices, the alternatives of a set are stored in a tuple
+        self.choices = tuple(choices)
 
     def __str__(self) -> str:
         return "{" + "|".join([str(choice) for choice in self.choices]) + "}"
@@ -136,7 +181,7 @@ class SetToken(Token):
         return f"set_tok:{str(self)}"
 
     def __hash__(self):
-        return hash(tuple(self.choices))
+        return hash(self.choices)
 
     def __eq__(self, other) -> bool:
         return hash(self) == hash(other)
@@ -148,16 +193,58 @@ class SetToken(Token):
 # named segment token to distinguish from the maniphono SoundSegment
 # TODO: rename `segment` argument
 class SegmentToken(Token):
+    __slots__ = ("segment", "partial", "fvalues", "_hash")
+
     def __init__(self, segment: Union[str, Sound, SoundSegment]):
         super().__init__()
 
         if isinstance(segment, str):
-            self.segment = parse_segment(segment)
+            self.segment = _parse_grapheme(segment)
         elif isinstance(segment, Sound):
             self.segment = SoundSegment(segment)
         else:
             self.segment = segment
 
+        self._cache_segment_info()
+
+    def _cache_segment_info(self):
+        # Cache information on the segment which is checked for every position of
+        # a sequence during matching, such as whether it is partial (i.e., a sound
+        # class). The cache remains valid because the segment of a token is never
+        # modified: it is never changed by the library, and only copies of it are
+        # returned to users (see `copy_segment()`)
+        # TODO: currently working only with monosonic segments
+        sounds = getattr(self.segment, "sounds", None)
+        self.partial = bool(sounds and sounds[0].partial)
+
+        # Cache the set of feature values of the segment, so that matching sounds
+        # against a partial segment is reduced to a subset check (which is what the
+        # `>=` comparison of maniphono amounts to) without rebuilding the feature
+        # dictionary of the reference at every position
+        self.fvalues = frozenset(sounds[0].fvalues) if sounds else frozenset()
+
+        # Cache the hash of the segment, which is used for all comparisons of
+        # non-partial segments and which maniphono computes from sorted feature values
+        self._hash = hash(self.segment)
+
+    def copy_segment(self) -> Segment:
+        """
+        Return a copy of the segment of the token.
+
+        The segment of a token might be shared by other tokens (and rules), so this
+        copy must be used whenever it is returned to the user, who is free to
+        modify it in place.
+
+        @return: A new segment, equal to the one of the token.
+        """
+
+        sounds = getattr(self.segment, "sounds", None)
+        if sounds is None:
+            # Segments without sounds, such as boundaries, carry no information
+            return self.segment
+
+        return SoundSegment([_copy_sound(sound) for sound in sounds])
+
     def __str__(self) -> str:
         return str(self.segment)
 
@@ -165,18 +252,17 @@ class SegmentToken(Token):
         return f"segment_tok:{str(self)}"
 
     def __hash__(self):
-        return hash(self.segment)
+        return self._hash
 
     def __eq__(self, other) -> bool:
         return hash(self) == hash(other)
 
     def __ne__(self, other) -> bool:
-        return hash(self) == hash(other)
+        return hash(self) != hash(other)
 
-    def add_modifier(self, modifier):
-        # TODO: properly implement with the __add__ operation from maniphono
-        # hack using graphemic representation...
-        grapheme = str(self.segment.sounds[0])
-        sound = Sound(grapheme) + modifier
-        segment = SoundSegment(sound)
-        self.segment = segment
+    def __add__(self, modifier: str):
+        # Return a new token with the modifier applied, so that tokens (which are
+        # shared by all rules parsed from the same string) are never modified; the
+        # `__add__` operation from maniphono also returns a modified copy, leaving
+        # the original segment, which might be cached and shared, unaltered
+        return SegmentToken(self.segment.sounds[0] + modifier)
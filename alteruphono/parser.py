@@ -1,3 +1,4 @@
+import functools
 import re
 import unicodedata
 from typing import List, Tuple
@@ -15,15 +16,29 @@ from .model import (
 
 # TODO: context must have a focus
 
-# Define capture regexes for rules without and with context
-RE_RULE_NOCTX = re.compile(r"^(?P<ante>[^>]+)>(?P<post>[^/]+)$")
-RE_RULE_CTX = re.compile(r"^(?P<ante>[^>]+)>(?P<post>[^/]+)/(?P<context>.+)$")
-RE_BACKREF_NOMOD = re.compile(r"^@(?P<index>\d+)$")
-RE_BACKREF_MOD = re.compile(r"^@(?P<index>\d+)\[(?P<mod>[^\]]+)\]$")
+# Define capture regexes for rules, with an optional context, and for other
+# elements; all are compiled once and their methods are called directly
+RE_RULE = re.compile(r"^(?P<ante>[^>]+)>(?P<post>[^/]+)(/(?P<context>.+))?$")
+RE_BACKREF = re.compile(r"^@(?P<index>\d+)(\[(?P<mod>[^\]]+)\])?$")
+RE_WHITESPACE = re.compile(r"\s+")
+
+# Boundary, focus, and empty tokens carry no information besides their type, so a
+# single instance of each is shared by all parsed rules
+BOUNDARY_TOKEN = BoundaryToken()
+FOCUS_TOKEN = FocusToken()
+EMPTY_TOKEN = EmptyToken()
+
+# Map of the atoms that are parsed as literals to their tokens, checked with a
+# single dictionary lookup instead of a sequence of string comparisons
+LITERAL_ATOMS = {"#": BOUNDARY_TOKEN, "_": FOCUS_TOKEN, ":null:": EMPTY_TOKEN}
 
 
 # TODO: __repr__, __str__, and __hash__ should deal with ante and post, not source
 class Rule:
+    # Rules are created in bulk when loading lists of sound changes, so their
+    # attributes are declared in slots, as for tokens
+    __slots__ = ("source", "ante", "post", "_nonempty_post")
+
     def __init__(self, source: str):
         self.source = source
 
@@ -32,6 +47,24 @@ class Rule:
         self.ante: List[Token] = _ante
         self.post: List[Token] = _post
 
+        # Tokens of `post` without the empty ones, computed only when first needed
+        self._nonempty_post = None
+
+    @property
+    def nonempty_post(self) -> List[Token]:
+        """
+        The tokens of `post` without empty tokens (`:null:`).
+
+        As these are missing from any sequence matched by the rule in backward
+        operations, the list is computed on first access and cached.
+        """
+        if self._nonempty_post is None:
+            self._nonempty_post = [
+                token for token in self.post if not isinstance(token, EmptyToken)
+            ]
+
+        return self._nonempty_post
+
     def __repr__(self) -> str:
         ante_str = " ".join([repr(token) for token in self.ante])
         post_str = " ".join([repr(token) for token in self.post])
@@ -59,7 +92,7 @@ def preprocess(rule: str) -> str:
     rule = unicodedata.normalize("NFD", rule)
 
     # 2. Replace multiple spaces with single ones, and remove leading/trailing spaces
-    rule = re.sub(r"\s+", " ", rule.strip())
+    rule = RE_WHITESPACE.sub(" ", rule.strip())
 
     return rule
 
@@ -68,6 +101,10 @@ def parse_atom(atom_str: str) -> Token:
     # Internal function for parsing an atom
     atom_str = atom_str.strip()
 
+    token = LITERAL_ATOMS.get(atom_str)
+    if token is not None:
+        return token
+
     if atom_str[0] == "{" and atom_str[-1] == "}":
         # a set
         # TODO: what if it is a set with modifiers?
@@ -77,64 +114,74 @@ def parse_atom(atom_str: str) -> Token:
         # If we have a choice, we parse it just like a sequence
         choices = [parse_atom(choice) for choice in atom_str.split("|")]
         return ChoiceToken(choices)
-    elif atom_str == "#":
-        return BoundaryToken()
-    elif atom_str == "_":
-        return FocusToken()
-    elif atom_str == ":null:":
-        return EmptyToken()
-    elif (match := re.match(RE_BACKREF_MOD, atom_str)) is not None:
-        # Return the index as an integer, along with any modifier.
+    elif atom_str[0] != "@":
+        # Assume it is a grapheme, as only back-references start with "@"
+        return SegmentToken(atom_str)
+    elif (match := RE_BACKREF.match(atom_str)) is not None:
+        # Return the index as an integer, along with any modifier (which is `None`
+        # if the back-reference has none, so a single regular expression is needed).
         # Note that we substract one unit as our lists indexed from 1 (unlike Python,
         # which indexes from zero)
         # TODO: deal with modifiers
         mod = match.group("mod")
         index = int(match.group("index")) - 1
         return BackRefToken(index, mod)
-    elif (match := re.match(RE_BACKREF_NOMOD, atom_str)) is not None:
-        # Return the index as an integer.
-        # Note that we substract one unit as our lists indexed from 1 (unlike Python,
-        # which indexes from zero)
-        index = int(match.group("index")) - 1
-        return BackRefToken(index)
 
     # Assume it is a grapheme
     return SegmentToken(atom_str)
 
 
+def _parse_seq(seq: str) -> List[Token]:
+    # Internal function for parsing a sequence of atoms separated by spaces; note
+    # that `.split()` with no arguments already skips leading and trailing spaces
+    return [parse_atom(atom) for atom in seq.split()]
+
+
 def parse_seq_as_rule(seq):
-    seq = preprocess(seq)
-    return [parse_atom(atom) for atom in seq.strip().split()]
+    return _parse_seq(preprocess(seq))
 
 
 def parse_rule(rule: str) -> Tuple[List[Token], List[Token]]:
+    """
+    Parse a rule into its `ante` and `post` sequences of tokens.
+
+    As the same rules are usually parsed many times, results are cached by rule
+    string. New lists are returned at each call, but the tokens are shared by all
+    rules parsed from the same string, and as such must never be modified in place;
+    tokens are never modified by the library, and `forward()` and `backward()` only
+    return copies of the segments they hold (see `SegmentToken.copy_segment()`).
+
+    @param rule: The rule to be parsed.
+    @return: A tuple with the lists of tokens of `ante` and `post`.
+    """
+
+    ante_seq, post_seq = _parse_rule(rule)
+
+    return list(ante_seq), list(post_seq)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_rule(rule: str) -> Tuple[Tuple[Token, ...], Tuple[Token, ...]]:
     # Pre-process the rule and then split into `ante`, `post`, and `context`, which
     # are stripped of leading/trailing spaces. As features, feature values, and graphemes
     # cannot have the reserved ">" and "/" characters, this is very straightforward:
-    # we just try to match both without and with context, and see if we get a match.
-    # While a single regular expression could be used, splitting in two different ones
-    # is better, also due to our usage of named captures (that must be unique in the
-    # whole regular expression)
+    # a single regular expression, where the context is optional, is matched only
+    # once (`context` is `None` if the rule has no context)
     rule = preprocess(rule)
-    if (match := re.match(RE_RULE_CTX, rule)) is not None:
-        ante, post, context = (
-            match.group("ante"),
-            match.group("post"),
-            match.group("context"),
-        )
-    elif (match := re.match(RE_RULE_NOCTX, rule)) is not None:
-        ante, post, context = match.group("ante"), match.group("post"), None
-    else:
+    match = RE_RULE.match(rule)
+    if match is None:
         raise ValueError("Unable to parse rule `rule`")
 
-    # Strip ante, post and context
-    ante_seq = [parse_atom(atom) for atom in ante.strip().split()]
-    post_seq = [parse_atom(atom) for atom in post.strip().split()]
+    ante, post, context = match.group("ante", "post", "context")
+
+    # Parse ante and post
+    ante_seq = _parse_seq(ante)
+    post_seq = _parse_seq(post)
 
     # If there is a context, parse it, split in `left` and `right`, in terms of the
     # focus, and merge it to `ante` and `post` so that we return only these two seqs
     if context:
-        cntx_seq = [parse_atom(atom) for atom in context.strip().split()]
+        cntx_seq = _parse_seq(context)
         for idx, token in enumerate(cntx_seq):
             if isinstance(token, FocusToken):
                 left_seq, right_seq = cntx_seq[:idx], cntx_seq[idx + 1:]
@@ -182,4 +229,4 @@ def parse_rule(rule: str) -> Tuple[List[Token], List[Token]]:
             BackRefToken(i + offset_left + offset_ante) for i, _ in enumerate(right_seq)
         ]
 
-    return ante_seq, post_seq
+    return tuple(ante_seq), tuple(post_seq)
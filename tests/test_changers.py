@@ -41,6 +41,69 @@ class TestChangers(unittest.TestCase):
             fw_str = " ".join([str(v) for v in fw])
             assert fw_str == str(post)
 
+    def test_forward_empty(self):
+        # Empty sequences have no positions to match, and are returned as such. Note
+        # that maniphono cannot build an empty sequence with boundaries, so one
+        # with `boundaries=None` (which leaves segments untouched) is used.
+        rule = alteruphono.Rule("p > b")
+        ante = maniphono.SegSequence([], boundaries=None)
+        assert alteruphono.forward(ante, rule) == []
+
+    def test_forward_keeps_ante(self):
+        # Back-references with modifiers must not alter the original sequence
+        rule = alteruphono.Rule("S[voiceless] a > @1[fricative] a")
+        ante = maniphono.parse_sequence("b a p a t a", boundaries=True)
+        ante_str = str(ante)
+        alteruphono.forward(ante, rule)
+        assert str(ante) == ante_str
+
+    def test_forward_output_not_shared(self):
+        # Segments in the output must not be shared with the rules, so that changing
+        # them in place does not affect later operations
+        post = alteruphono.forward("p a", "p > b")
+        post[1].add_fvalues("voiceless")
+        fw1 = alteruphono.forward("t a", "t > b")
+        fw2 = alteruphono.forward("b a", "b > m")
+        assert " ".join([str(v) for v in fw1]) == "# b a #"
+        assert " ".join([str(v) for v in fw2]) == "# m a #"
+
+    def test_backward_output_not_shared(self):
+        post = alteruphono.backward("# b a #", "p > b")
+        for seq in post:
+            seq[1].add_fvalues("voiced")
+        bw = alteruphono.backward("# b a #", "p > b")
+        assert tuple([str(b) for b in bw]) == ("# b a #", "# p a #")
+
+    def test_shared_rule_tokens(self):
+        # Rules parsed from the same string share their tokens, which must not be
+        # reachable through the results of any of them
+        rule1 = alteruphono.Rule("p > b / _ V")
+        rule2 = alteruphono.Rule("p > b / _ V")
+        rule_repr = repr(rule2)
+
+        post = alteruphono.forward("# p a #", rule1)
+        post[1].add_fvalues("voiceless")
+        for seq in alteruphono.backward("# b a #", rule1):
+            seq[1].add_fvalues("nasal")
+
+        assert repr(rule2) == rule_repr
+        fw = alteruphono.forward("# p a #", rule2)
+        assert " ".join([str(v) for v in fw]) == "# b a #"
+
+    def test_cached_token_info(self):
+        # Changing results in place must not invalidate the information cached by
+        # the tokens of the rule, including partial segments
+        rule = alteruphono.Rule("C > V")
+        post = alteruphono.forward("# p a #", rule)
+        post[1].add_fvalues("front")
+
+        for token in rule.ante + rule.post:
+            assert hash(token) == hash(token.segment)
+            assert token.fvalues == frozenset(token.segment.sounds[0].fvalues)
+
+        fw = alteruphono.forward("# t a #", rule)
+        assert " ".join([str(v) for v in fw]) == "# V a #"
+
     def test_backward_hardcoded(self):
         reference = {
             ("p V > b a", "b a r b a"): (
@@ -62,6 +125,41 @@ class TestChangers(unittest.TestCase):
 
             assert bw_strs == ref
 
+    def test_backward_keeps_rule(self):
+        # Back-reference modifiers must not alter the tokens of the rule, which are
+        # shared by all rules parsed from the same string
+        rule = alteruphono.Rule("p|t > @1[voiced]")
+        rule_repr = repr(rule)
+        alteruphono.backward("# b a d a #", rule)
+        assert repr(rule) == rule_repr
+        assert repr(alteruphono.Rule("p|t > @1[voiced]")) == rule_repr
+
+    def test_backward_unique(self):
+        # Candidates that can be reconstructed in more than one way, such as when a
+        # rule maps a segment to itself, are returned only once
+        bw = alteruphono.backward("# a #", "a > a")
+        assert tuple([str(b) for b in bw]) == ("# a #",)
+
+        bw = alteruphono.backward("# a b a #", "a > a")
+        assert tuple([str(b) for b in bw]) == ("# a b a #",)
+
+    def test_check_match_sounds(self):
+        # Bare sounds can be used in patterns, both full and partial ones
+        seq = list(maniphono.parse_sequence("p a t", boundaries=False))
+        pattern = [maniphono.Sound("p"), maniphono.Sound("V"), maniphono.Sound("k")]
+        assert alteruphono.check_match(seq, pattern) == (False, [True, True, False])
+
+        pattern = [maniphono.Sound("p"), maniphono.Sound("V"), maniphono.Sound("C")]
+        assert alteruphono.check_match(seq, pattern) == (True, [True, True, True])
+
+    def test_string_arguments(self):
+        # Sequences and rules can be passed as strings, and are parsed internally
+        fw = alteruphono.forward("# p a t e #", "p > t / _ V")
+        assert " ".join([str(v) for v in fw]) == "# t a t e #"
+
+        bw = alteruphono.backward("# p a t e #", "p > t / _ V")
+        assert tuple([str(b) for b in bw]) == ("# p a p e #", "# p a t e #")
+
     # def test_forward_resources(self):
     #     sound_changes = alteruphono.utils.read_sound_changes()
     #
@@ -52,6 +52,22 @@ class TestParser(unittest.TestCase):
             assert tuple(ante) == test["ante"]
             assert tuple(post) == test["post"]
 
+    def test_parse_rule_cached(self):
+        # Parsing is cached, but each call must return new lists
+        ante1, post1 = alteruphono.parse_rule("p > b / _ V")
+        ante1.append(SegmentToken("a"))
+        ante2, post2 = alteruphono.parse_rule("p > b / _ V")
+        assert ante1 is not ante2
+        assert tuple(ante2) == (SegmentToken("p"), SegmentToken("V"))
+        assert tuple(post2) == tuple(post1)
+
+    def test_segment_token_modifier(self):
+        # Adding a modifier returns a new token, leaving the original unaltered
+        token = SegmentToken("p")
+        voiced = token + "voiced"
+        assert str(token) == "p"
+        assert str(voiced) == "b"
+
 
 if __name__ == "__main__":
     # Explicitly creating and running a test suite allows to profile